@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from gisaid_download import gisaid_download as gd
+
+socket_name = ".gisaid_download.sock"
+# seconds to wait for a reply before doing the work without the server
+request_timeout = 60
+update_timeout = 30 * 60
+
+class AccessionIndex:
+    """Keeps the accessions from every file in `accession_dir` in memory, rereading only files that change"""
+
+    def __init__(self,accession_dir:Path) -> None:
+        self.accession_dir = Path(accession_dir)
+        self.files = {} # {file: ((mtime_ns, size), accessions)}
+        self.downloaded = set()
+        self.lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """Rereads any new or changed accession files (and forgets removed ones)
+
+        Returns:
+            True if anything changed
+        """
+
+        with self.lock:
+            current = {}
+            for f in self.accession_dir.glob("*"):
+                if f.name.startswith("."): continue
+                try:
+                    stat = f.stat()
+                except FileNotFoundError:
+                    continue
+                current[f] = (stat.st_mtime_ns,stat.st_size)
+            changed = current.keys() != self.files.keys() or any(self.files[f][0] != key for f,key in current.items())
+            if changed:
+                self.files = {f:(key,self.files[f][1] if f in self.files and self.files[f][0] == key else gd.getSetFromFile(f)) for f,key in current.items()}
+                self.downloaded = set().union(*(accessions for _,accessions in self.files.values()))
+            return changed
+
+    def diff(self,all_gisaid_seqs:Path):
+        """Returns accessions in `all_gisaid_seqs` that haven't been downloaded yet"""
+
+        self.refresh()
+        with self.lock:
+            return gd.getSetFromFile(all_gisaid_seqs) - self.downloaded
+
+class AccessionServer(socketserver.ThreadingMixIn,socketserver.UnixStreamServer):
+    """Answers JSON-line requests (ping, diff, plan, update, shutdown) about `epicov_dir` over a Unix socket"""
+
+    daemon_threads = True
+
+    def __init__(self,socket_path:Path,epicov_dir:Path,ssh_vars=None,scripter=None,poll_seconds=2) -> None:
+        self.index = AccessionIndex(Path(epicov_dir) / "accession_info")
+        self.ssh_vars = ssh_vars
+        self.scripter = scripter
+        self.scripter_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.poll_seconds = poll_seconds
+        super().__init__(str(socket_path),RequestHandler)
+
+    def watch(self):
+        """Keeps the accession index current until the server stops"""
+
+        while not self.stopped.wait(self.poll_seconds):
+            if self.index.refresh():
+                print(f"Accession index updated: {len(self.index.downloaded)} accessions in {len(self.index.files)} files")
+
+    def answer(self,request:dict):
+        """Returns the reply to `request`"""
+
+        kind = request.get("request")
+        if kind == "ping":
+            return {"ok":True,"accessions":len(self.index.downloaded),"files":len(self.index.files)}
+        elif kind == "diff":
+            new = self.index.diff(Path(request["all_gisaid_seqs"]))
+            return {"ok":True,"new":sorted(new)}
+        elif kind == "plan":
+            new = self.index.diff(Path(request["all_gisaid_seqs"]))
+            download_limit = request.get("download_limit",10000)
+            runthroughs = math.ceil(len(new)/download_limit)
+            sizes = [min(download_limit,len(new) - runthrough*download_limit) for runthrough in range(runthroughs)]
+            return {"ok":True,"new":len(new),"runthroughs":sizes}
+        elif kind == "update":
+            if not self.scripter:
+                return {"ok":False,"error":"server was started without cluster access"}
+            with self.scripter_lock:
+                gd.update_accessions(self.ssh_vars,self.scripter)
+            self.index.refresh()
+            return {"ok":True,"accessions":len(self.index.downloaded)}
+        elif kind == "shutdown":
+            self.stopped.set()
+            threading.Thread(target=self.shutdown).start()
+            return {"ok":True}
+        else:
+            return {"ok":False,"error":f"unknown request: {kind}"}
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Replies to each JSON line sent over a connection"""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.answer(json.loads(line))
+            except Exception as e:
+                reply = {"ok":False,"error":f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+            self.wfile.flush()
+
+def request(socket_path:Path,message:dict,timeout=request_timeout):
+    """Sends `message` to a running `gisaid_download serve` and returns its reply (or None if no server is reachable or it doesn't answer within `timeout` seconds)"""
+
+    socket_path = Path(socket_path)
+    if not socket_path.exists(): return None
+    try:
+        with socket.socket(socket.AF_UNIX,socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(str(socket_path))
+            client.sendall((json.dumps(message) + "\n").encode())
+            with client.makefile("rb") as fh:
+                line = fh.readline()
+    except socket.timeout:
+        print(f"\tgisaid_download serve did not answer {message.get('request')} within {timeout} seconds")
+        return None
+    except OSError:
+        return None
+    if not line: return None
+    reply = json.loads(line)
+    if not reply.get("ok"):
+        print(f"\tgisaid_download serve could not answer {message.get('request')}: {reply.get('error')}")
+        return None
+    return reply
+
+def getServerSocket(config):
+    """Returns the `server_socket` path set in `config`'s Paths section (or None)"""
+
+    server_socket = config["Paths"].get("server_socket","").strip()
+    return Path(server_socket) if server_socket else None
+
+def serve(epicov_dir:Path,socket_path:Path=None,ssh_vars=None,scripter=None,poll_seconds=2):
+    """Answers requests about `epicov_dir` until a shutdown request or KeyboardInterrupt"""
+
+    epicov_dir = Path(epicov_dir)
+    if socket_path is None: socket_path = epicov_dir / socket_name
+    socket_path = Path(socket_path)
+    if request(socket_path,{"request":"ping"},timeout=5):
+        gd.warn(f"gisaid_download serve is already running at {socket_path}")
+    if socket_path.exists(): socket_path.unlink() # left over from a server that didn't shut down cleanly
+    server = AccessionServer(socket_path,epicov_dir,ssh_vars,scripter,poll_seconds)
+    watcher = threading.Thread(target=server.watch,daemon=True)
+    watcher.start()
+    print(f"Serving {len(server.index.downloaded)} accessions from {server.index.accession_dir} at {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stopped.set()
+        server.server_close()
+        if socket_path.exists(): socket_path.unlink()
+        print("gisaid_download serve stopped")
+
+def main():
+    """Runs `gisaid_download serve`: keeps the accession index warm (and runs cluster updates) for other gisaid_download runs"""
+
+    parser = argparse.ArgumentParser(prog="gisaid_download serve",
+        description="Keeps the accession index for `epicov_dir` in memory and answers other gisaid_download runs over a local Unix socket")
+    parser.add_argument("serve")
+    parser.add_argument("-w","--epicov_dir",type=Path,default=None,help="local directory containing all related downloads (default: from config)")
+    parser.add_argument("-c","--config_file",type=Path,default=Path("./gisaid_config.ini"),help="path to config (default: ./gisaid_config.ini)")
+    parser.add_argument("--socket",type=Path,default=None,help=f"path for the Unix socket (default: `server_socket` in config, else `epicov_dir`/{socket_name}) - other runs find it via the same config key (or their `--server_socket`)")
+    parser.add_argument("-n","--no_cluster",dest="cluster_interact",action="store_false",help="don't accept `update` requests (which interact with the cluster)")
+    args = parser.parse_args()
+
+    config = gd.readConfig(args.config_file)
+    path_vars = gd.get_elements(config,"Paths",("epicov_dir","cluster_epicov_dir"))
+    epicov_dir = args.epicov_dir or path_vars.epicov_dir
+    if not epicov_dir:
+        raise AttributeError("Attribute `epicov_dir` must be provided in config or arguments.")
+    epicov_dir.joinpath("accession_info").mkdir(parents=True,exist_ok=True)
+    ssh_vars = scripter = None
+    if args.cluster_interact:
+        ssh_vars = gd.get_elements(config,"SSH",("site","group","login_config","save_credentials"))
+        ssh_vars.add_var("cluster_epicov_dir",path_vars.cluster_epicov_dir)
+        ssh_vars.add_var("local_epicov_dir",epicov_dir)
+        ssh_vars = gd.checkSSH(ssh_vars)
+        scripter = gd.getScripter(ssh_vars)
+    serve(epicov_dir,args.socket or getServerSocket(config),ssh_vars,scripter)
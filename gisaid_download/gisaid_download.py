@@ -1,7 +1,14 @@
 #!/usr/bin/env python3
 
 from configparser import ConfigParser
+import errno
+import hashlib
+import json
+import math
 import os
+import secrets
+import shlex
+import socket
 from pathlib import Path
 import argparse
 import time
@@ -21,6 +28,16 @@ def warn(warning):
     print(warning)
     exit(1)
 
+# False when steps go to an automation driver, which uses stdin for its acknowledgements
+interactive = True
+
+def ask(prompt):
+    """Returns user input for `prompt` (or exits if nobody is there to answer it)"""
+
+    if not interactive:
+        warn(f"Cannot ask for input while steps go to an automation driver (--protocol jsonl):\n{prompt.strip()}")
+    return input(prompt)
+
 def findDownloadsDir(downloads):
     """Locates or requests input of directory where downloads typically go"""
 
@@ -38,7 +55,7 @@ def findDownloadsDir(downloads):
     if len(possible_download_dirs) == 1:
         return possible_download_dirs[0]
     # request location, because can't find it
-    return input("Please enter the path to your downloads file now or quit and add it with parameter '-d'\n>")
+    return ask("Please enter the path to your downloads file now or quit and add it with parameter '-d'\n>")
 
 def getState(location):
     """Sets which locations will be downloaded based on `location` list variable in config"""
@@ -48,7 +65,7 @@ def getState(location):
     elif location in states.values(): return location
     else:
         print(f"Could not find a state with name {location}.")
-        new_location = input("Correct the spelling and hit enter or \nPress enter to continue anyway or \nType 'quit' or '^C' to quit.\n>")
+        new_location = ask("Correct the spelling and hit enter or \nPress enter to continue anyway or \nType 'quit' or '^C' to quit.\n>")
         if new_location.lower() == "quit": exit(1)
         elif new_location == "": return location
         else: getState(location)
@@ -103,10 +120,18 @@ def checkSSH(ssh_vars):
         var = getattr(ssh_vars,x)
         if not var:
             print(f"{x} not found in config")
-            new_value = input(f"Please enter your {x}\n>>")    
+            new_value = ask(f"Please enter your {x}\n>>")    
             setattr(ssh_vars,x,new_value)
     return ssh_vars
 
+def readConfig(config_file:Path):
+    """Returns a ConfigParser for `config_file`"""
+
+    if not config_file.exists(): raise FileNotFoundError(config_file)
+    config = ConfigParser(converters={'list': lambda x: [i.strip() for i in x.split(',')]})
+    config.read(config_file)
+    return config
+
 def getVariables():
     """Gets variables from arguments and config to direct behavior"""
 
@@ -131,25 +156,38 @@ def getVariables():
         parser.add_argument("-q","--quick",action="store_false",dest="wait",help="don't wait for user to hit enter between each step")
         parser.add_argument("-s","--skip_local_update",action="store_true",help="don't update local list of downloaded accessions (if unset, files will be retrieved from the cluster before the EpiCoV download steps)")
         parser.add_argument("-n","--no_cluster",dest="cluster_interact",action="store_false",help="don't interact trasfer any files to/from the cluster")
+        parser.add_argument("-r","--remote_diff",action="store_true",help="instead of copying all of the cluster's accession_info here (step 1), upload each location's accession list and determine new accessions on the cluster")
+        parser.add_argument("-O","--operator",default=None,help="your name - if set, new accessions are claimed in leased batches so multiple operators sharing an `epicov_dir` don't download the same ones")
+        parser.add_argument("--protocol",choices=["text","jsonl"],default="text",help="'text': print steps for a person to follow (default) or 'jsonl': send steps as JSON lines to an automation driver over stdout/stdin (or `--socket`) and wait for each to be acknowledged")
+        parser.add_argument("--socket",type=Path,default=None,help="with `--protocol jsonl`, exchange steps over a Unix socket created at this path instead of stdout/stdin")
+        parser.add_argument("--server_socket",type=Path,default=None,help="where to find a running `gisaid_download serve` (default: `server_socket` in config, else `epicov_dir`/.gisaid_download.sock)")
+        parser.add_argument("--lease_minutes",type=float,default=None,help="minutes before an unfinished operator's leased accessions return to the pool (default: 240)")
     else:
         example = True
     args = parser.parse_args()
 
+    # hand steps to an automation driver instead of a person, if requested (before anything else is printed)
+    driver = None
+    if not example and args.protocol == "jsonl":
+        global interactive
+        from gisaid_download import protocol as step_protocol
+        if args.socket: driver = step_protocol.unixSocketProtocol(args.socket)
+        else: driver = step_protocol.stdioProtocol()
+        interactive = False
+
     # variable cleanup
     if example:
         # ensure all these attribtes exist - they won't be used, but the return statement need them
-        for var in ["date","filetypes","meta_files","location","get_epi_set","downloads","epicov_dir","cluster_epicov_dir","config_file","wait","skip_local_update","cluster_interact"]:
+        for var in ["date","filetypes","meta_files","location","get_epi_set","downloads","epicov_dir","cluster_epicov_dir","config_file","wait","skip_local_update","cluster_interact","operator","lease_minutes","protocol","socket","remote_diff","server_socket"]:
             setattr(args,var,None)
-        filetype_choices,ssh_vars,followup_command,custom_filters = [None]*4
+        filetype_choices,ssh_vars,followup_command,custom_filters,qc_vars = [None]*5
     else:
         # notify if date has incorrect format - not worth failing script over, though
         if not len(args.date) == 10 or not "-" in args.date:
             print(f"WARNING: `date` ({args.date}) not in expected format 'YYYY-MM-DD'")
 
         # get config variables
-        if not args.config_file.exists(): raise FileNotFoundError(args.config_file)
-        config = ConfigParser(converters={'list': lambda x: [i.strip() for i in x.split(',')]})
-        config.read(args.config_file)
+        config = readConfig(args.config_file)
 
         # vars that may come from config
         followup_command = config["Misc"].get("followup_command")
@@ -160,6 +198,14 @@ def getVariables():
         epicov_dir,cluster_epicov_dir,downloads = [getattr(path_vars,val) for val in path_var_list]
         filetypes = config.getlist("Misc","filetypes")
         location = config.getlist("Misc","location")
+        if not args.operator: args.operator = config["Misc"].get("operator") or None
+        if not args.lease_minutes: args.lease_minutes = config["Misc"].getfloat("lease_minutes",240)
+        if not args.server_socket:
+            from gisaid_download import daemon
+            args.server_socket = daemon.getServerSocket(config)
+        qc_vars = VariableHolder("qc")
+        qc_vars.add_var("min_length",config["Misc"].getint("qc_min_length",0))
+        qc_vars.add_var("max_n_fraction",config["Misc"].getfloat("qc_max_n_fraction",0.3))
 
         # prioritize cli version of these but use config default (if possible) if they don't exist
         for var in ("epicov_dir","cluster_epicov_dir","filetypes","location"):
@@ -178,7 +224,7 @@ def getVariables():
         filetype_choices,meta_files = determineFileTypesToDownload(args.filetypes)
         args.epicov_dir.mkdir(parents=True, exist_ok=True)
 
-    return args.date,args.location,args.downloads,filetype_choices,meta_files,args.get_epi_set,args.epicov_dir,ssh_vars,args.wait,args.skip_local_update,followup_command,args.cluster_interact,custom_filters,example,args.outdir
+    return args.date,args.location,args.downloads,filetype_choices,meta_files,args.get_epi_set,args.epicov_dir,ssh_vars,args.wait,args.skip_local_update,followup_command,args.cluster_interact,custom_filters,example,args.outdir,args.operator,args.lease_minutes,qc_vars,args.remote_diff,args.server_socket,driver
 
 def continueFromHere(runthrough=None):
     """Prints a showy line so users can easily find where they left off"""
@@ -193,31 +239,105 @@ def awaitEnter(wait=True):
     """Waits until user hits `enter`"""
 
     if wait:
-        input("\n\tPress enter in terminal to continue...\n")
+        ask("\n\tPress enter in terminal to continue...\n")
         continueFromHere()
 
+# callables that receive each guided step as (step, details) - e.g. a browser simulator or automation driver
+step_handlers = []
+
+def emitStep(step,**details):
+    """Passes `step` and its `details` to every handler in `step_handlers`"""
+
+    for handler in step_handlers:
+        handler(step,details)
+
 def click(item_to_click,item_type="button",wait=False):
     """Returns str: Click (`item_type`) `item_to_click`"""
 
     print(f'\tClick ({item_type}) "{item_to_click}"')
+    emitStep("click",item=item_to_click,item_type=item_type)
     awaitEnter(wait)
 
 def fill(item_to_fill,content,wait=False):
     """Returns str: 'Fill in "`item_to_fill`" as: `item_to_click`'"""
 
     print(f'\tFill in "{item_to_fill}" as: {content}')
+    emitStep("fill",item=item_to_fill,content=content)
     awaitEnter(wait)
 
+def note(*messages):
+    """Prints an instruction that has no typed step (passing it on to step handlers as a 'note')"""
+
+    message = " ".join(str(m) for m in messages)
+    print(f"\t{message}")
+    emitStep("note",message=message)
+
 def listdir(dir_name:Path):
     """Returns a set of all directories in `dir_name`"""
 
     return set(file for file in dir_name.iterdir())
 
+def fsyncDir(dir_name:Path):
+    """Flushes `dir_name`'s entries (like a newly renamed file) to disk, where the filesystem allows it"""
+
+    try:
+        fd = os.open(dir_name, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def moveFile(src:Path,dst:Path,buffer_size=8*1024*1024):
+    """Moves `src` to `dst`, even across filesystems, without risking data loss
+
+    On the same filesystem, this is a rename. Otherwise, `src` is streamed into a hidden temporary file next to `dst`
+    (checksumming as it goes, in the same single pass), which is fsynced, size-checked, and renamed to `dst` before `src` is removed.
+    """
+
+    src,dst = Path(src),Path(dst)
+    if src.stat().st_dev == dst.parent.stat().st_dev:
+        try:
+            os.replace(src,dst)
+            return dst
+        except OSError:
+            pass # some mounts (like WSL's drvfs) can refuse renames - fall back to copying
+    temp = dst.with_name(f".{dst.name}.{os.getpid()}.part")
+    checksum = hashlib.blake2b()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    size = 0
+    try:
+        with open(src,"rb",buffering=0) as fin, open(temp,"wb") as fout:
+            while 1:
+                n = fin.readinto(buffer)
+                if not n: break
+                checksum.update(view[:n])
+                fout.write(view[:n])
+                size += n
+            fout.flush()
+            os.fsync(fout.fileno())
+        # rereading the copy would only double the I/O (and be served from the page cache anyway), so just check its size
+        if temp.stat().st_size != size:
+            raise OSError(f"Size mismatch after copying {src} to {temp}: {temp.stat().st_size} != {size} bytes")
+        os.replace(temp,dst)
+    except BaseException:
+        if temp.exists(): temp.unlink()
+        raise
+    fsyncDir(dst.parent)
+    src.unlink()
+    print(f"\tCopied {src.name} to {dst.parent} ({size} bytes, blake2b {checksum.hexdigest()[:16]})")
+    return dst
+
 def awaitDownload(downloads:Path,outfile:Path,runthrough=None):
     """Waits for a file of the specified filetype to appear""" # TODO: add in verification of correct internal format (in case of erroneous clicks)
 
     print(f'\nWaiting for new file in downloads with extension "{outfile.suffix}"')
     already_there = listdir(downloads)
+    emitStep("expect_download",suffix=outfile.suffix)
     count = 0
     while 1:
         count+=1
@@ -257,7 +377,7 @@ def downloadFileAs(outbase:Path,outdir:Path,downloads:Path,action,action_input,a
             warn("\n\nScript stopped by KeyboardInterrupt")
         else:
             pass
-        downloaded_file.rename(outfile)
+        moveFile(downloaded_file,outfile)
         print(f"\tFile saved: {outfile}")
     return outfile
 
@@ -266,30 +386,260 @@ def getSetFromFile(file:Path):
 
     return set(file.read_text().splitlines())
 
-def getNewAccessions(accession_dir,all_gisaid_seqs,new_seqs):
-    """Checks all accessions available against accessions already downloaded - returns and writes out new ones"""
+def getNewAccessions(accession_dir,all_gisaid_seqs,new_seqs,daemon_socket=None):
+    """Checks all accessions available against accessions already downloaded - returns and writes out new ones
+
+    If `gisaid_download serve` is running at `daemon_socket`, its in-memory accession index is used instead of rereading `accession_dir`.
+    """
 
     print("\nDetermining which accessions to download")
-    # determine which seqs we already have
-    accession_files = accession_dir.glob("*")
-    already_downloaded_set = set()
-    for f in accession_files:
-        if not f.name == ".DS_Store": # for macs...
-            already_downloaded_set |= getSetFromFile(f)
-            # print("accessions found:",len(already_downloaded_set))
-    # get list of seqs in gisaid
-    if all_gisaid_seqs.exists():
+    if not all_gisaid_seqs.exists(): warn(f"file not found: {all_gisaid_seqs}")
+    reply = None
+    if daemon_socket:
+        from gisaid_download import daemon
+        reply = daemon.request(daemon_socket,{"request":"diff","all_gisaid_seqs":str(Path(all_gisaid_seqs).resolve())})
+    if reply:
+        print(f"\tUsing accession index from gisaid_download serve ({daemon_socket})")
+        new_set = set(reply["new"])
+    else:
+        # determine which seqs we already have
+        already_downloaded_set = getDownloadedAccessions(accession_dir)
+        # get list of seqs in gisaid
         gisaid_set = getSetFromFile(all_gisaid_seqs)
-    else: warn(f"file not found: {all_gisaid_seqs}")
-    # find seqs needed
-    new_set = gisaid_set - already_downloaded_set
+        # find seqs needed
+        new_set = gisaid_set - already_downloaded_set
     print("\tnew seqs in EpiCoV:",len(new_set))
+    # sorted, so each runthrough always selects the same accessions (even on reruns)
+    new_seq_list = sorted(new_set)
     # write out seqs to file to put in eipcov
     with new_seqs.open('w') as out:
-        for id in new_set:
+        for id in new_seq_list:
+            out.write(f"{id}\n")
+    print(f"\tNew accessions written to {new_seqs}")
+    return new_seq_list
+
+def getNewAccessionsRemotely(ssh_vars:VariableHolder,scripter:Scripter,all_gisaid_seqs:Path,new_seqs:Path):
+    """Determines new accessions on the cluster (so only `all_gisaid_seqs` and the new accessions cross the network) - returns and writes out new ones"""
+
+    import gzip
+    print("\nDetermining which accessions to download (on the cluster)")
+    if not all_gisaid_seqs.exists(): warn(f"file not found: {all_gisaid_seqs}")
+    cluster_dir = Path(ssh_vars.cluster_epicov_dir)
+    remote_dir = cluster_dir / ".remote_diff"
+    helper = Path(__file__).parent / "remote_diff.py"
+    result_name = f"new_{all_gisaid_seqs.stem}.txt.gz"
+    local_result = new_seqs.parent / f".{result_name}"
+
+    remote_seqs = remote_dir / all_gisaid_seqs.name
+    remote_result = remote_dir / result_name
+    # (sftp accepts double-quoted paths, so directories with spaces work)
+    sftp_quote = lambda path: f'"{path}"'
+    # hpc_interact never reports failures, so don't let a result left by an earlier run pass for this one
+    if local_result.exists(): local_result.unlink()
+
+    # upload accession list & helper
+    scripter.reset_mode("sftp")
+    scripter.put(sftp_quote(helper), sftp_quote(remote_dir), new_name=helper.name, options=[])
+    scripter.put(sftp_quote(all_gisaid_seqs), sftp_quote(remote_dir), new_name=all_gisaid_seqs.name, options=[])
+    scripter.preview_steps()
+    scripter.run()
+    # diff against the cluster's accession_info
+    scripter.reset_mode("ssh")
+    args = " ".join(shlex.quote(str(arg)) for arg in (remote_dir/helper.name, cluster_dir/"accession_info", remote_seqs, remote_result))
+    scripter.add_step(f"rm -f {shlex.quote(str(remote_result))} && python3 {args}")
+    scripter.preview_steps()
+    scripter.run()
+    # download just the new accessions, then clean up so .remote_diff doesn't keep growing
+    scripter.reset_mode("sftp")
+    scripter.get(sftp_quote(remote_result), sftp_quote(new_seqs.parent), new_name=local_result.name, options=[])
+    scripter.add_step(f"rm {sftp_quote(remote_seqs)}")
+    scripter.add_step(f"rm {sftp_quote(remote_result)}")
+    scripter.preview_steps()
+    scripter.run()
+
+    if not local_result.exists(): warn(f"New accessions were not retrieved from the cluster (see above for errors): {remote_result}")
+    with gzip.open(local_result,"rt") as fh:
+        new_set = set(fh.read().split())
+    local_result.unlink()
+    print("\tnew seqs in EpiCoV:",len(new_set))
+    # sorted, so each runthrough always selects the same accessions (even on reruns)
+    new_seq_list = sorted(new_set)
+    with new_seqs.open('w') as out:
+        for id in new_seq_list:
             out.write(f"{id}\n")
     print(f"\tNew accessions written to {new_seqs}")
-    return list(new_set)
+    return new_seq_list
+
+def acquireLeaseLock(lease_dir:Path,stale_after=60):
+    """Creates `lease_dir`/.lock atomically, waiting for (or breaking, if stale) any other operator's lock
+
+    Returns:
+        (lock file, unique token written to it) - pass both to `releaseLeaseLock`
+    """
+
+    lock_file = lease_dir / ".lock"
+    token = f"{socket.gethostname()}.{os.getpid()}.{secrets.token_hex(8)}"
+    temp_file = lease_dir / f".lock.{token}.tmp"
+    temp_file.write_text(token)
+    try:
+        while 1:
+            if placeLock(lock_file,token,temp_file):
+                return lock_file,token
+            try:
+                seen_token = lock_file.read_text()
+                seen_mtime = lock_file.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if time.time() - seen_mtime > stale_after:
+                breakStaleLock(lock_file,seen_token,seen_mtime,token)
+            else:
+                time.sleep(.1)
+    finally:
+        temp_file.unlink()
+
+def placeLock(lock_file:Path,token,source:Path):
+    """Atomically creates `lock_file` holding `token` (also the contents of `source`) - returns False if a lock already exists
+
+    The lock is hard-linked from `source` so it always has its token. Where hard links aren't supported
+    (like many CIFS/SMB mounts), it's created exclusively instead and the token written right after.
+    """
+
+    try:
+        os.link(source, lock_file)
+        return True
+    except FileExistsError:
+        return False
+    except OSError as e:
+        if e.errno not in (errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS, errno.EMLINK):
+            raise
+    try:
+        fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as fh:
+        fh.write(token)
+    return True
+
+def breakStaleLock(lock_file:Path,seen_token,seen_mtime,token):
+    """Removes `lock_file` only if it's still the stale lock (with `seen_token`) that was seen, else puts it back"""
+
+    stale = lock_file.with_name(f".lock.stale.{token}")
+    try:
+        lock_file.rename(stale)
+    except FileNotFoundError:
+        return
+    try:
+        current_token = stale.read_text()
+        current_mtime = stale.stat().st_mtime
+    except FileNotFoundError:
+        return
+    if current_token == seen_token and current_mtime == seen_mtime:
+        print(f"\tRemoved stale lease lock: {seen_token}")
+        stale.unlink()
+    else:
+        # someone else broke the stale lock and took a new one before we moved it - restore theirs
+        if not placeLock(lock_file,current_token,stale):
+            print(f"\tWARNING: could not restore lease lock {current_token} taken while breaking a stale lock")
+        stale.unlink()
+
+def releaseLeaseLock(lock_file:Path,token):
+    """Removes `lock_file` if it's still ours (holds `token`)"""
+
+    try:
+        current_token = lock_file.read_text()
+    except FileNotFoundError:
+        current_token = None
+    if current_token == token:
+        lock_file.unlink()
+    else:
+        print(f"\tWARNING: lease lock was taken over by another operator ({current_token}) while held")
+
+def readLeases(lease_dir:Path):
+    """Returns dict of {lease_file: lease_info} for unexpired leases, returning expired ones to the pool"""
+
+    leases = {}
+    for lease_file in lease_dir.glob("*.lease"):
+        try:
+            lease = json.loads(lease_file.read_text())
+        except (FileNotFoundError, ValueError):
+            continue
+        if lease["expires"] < time.time():
+            print(f"\tLease expired - returning {len(lease['accessions'])} accessions to the pool: {lease_file.name}")
+            try: lease_file.unlink()
+            except FileNotFoundError: pass
+        else:
+            leases[lease_file] = lease
+    return leases
+
+def writeLease(lease_file:Path,lease:dict):
+    """Atomically (over)writes `lease_file` via a temporary file and rename"""
+
+    temp_file = lease_file.with_name(f".{lease_file.name}.{os.getpid()}.tmp")
+    temp_file.write_text(json.dumps(lease))
+    os.replace(temp_file, lease_file)
+
+def getDownloadedAccessions(accession_dir:Path):
+    """Returns set of all accessions in (non-hidden) files in `accession_dir`"""
+
+    downloaded = set()
+    for f in accession_dir.glob("*"):
+        if not f.name.startswith("."): # skip hidden files (like .DS_Store on macs or unfinished moves)
+            downloaded |= getSetFromFile(f)
+    return downloaded
+
+def claimAccessions(lease_dir:Path,accession_dir:Path,new_seqs,batch_size,operator,location,date,held=(),lease_minutes=240):
+    """Claims (via a lease file in `lease_dir`) up to `batch_size` accessions from `new_seqs` not already leased by another operator or saved in `accession_dir`
+
+    Any leases in `held` (from earlier claims this run) are renewed along the way. Unexpired leases this
+    `operator` took for `location` and `date` in an earlier (unfinished) run are taken over before any new claims.
+
+    Returns:
+        (list of claimed accessions, lease file, lease id) or ([], None, None) if nothing is left to claim
+    """
+
+    lease_dir.mkdir(parents=True, exist_ok=True)
+    lock_file,token = acquireLeaseLock(lease_dir)
+    try:
+        leases = readLeases(lease_dir)
+        # anything saved since our diff was made (like by an operator who just finished) is no longer available
+        downloaded = getDownloadedAccessions(accession_dir)
+        expires = time.time() + lease_minutes * 60
+        prefix = f"{operator}_{location}_{date}."
+        for lease_file,lease in leases.items():
+            if lease_file in held:
+                # renew our own leases while we still hold them
+                lease["expires"] = expires
+                writeLease(lease_file,lease)
+            elif lease_file.name.startswith(prefix) and lease["operator"] == operator:
+                if set(lease["accessions"]) <= downloaded:
+                    # saved but not released before the previous run stopped
+                    lease_file.unlink()
+                    continue
+                lease["expires"] = expires
+                writeLease(lease_file,lease)
+                print(f"\tTaking over {len(lease['accessions'])} accessions from your unfinished lease: {lease_file.name}")
+                return lease["accessions"],lease_file,lease["id"]
+        leased = set()
+        for lease_file,lease in leases.items():
+            if lease_file.exists(): leased.update(lease["accessions"])
+        available = sorted(set(new_seqs) - leased - downloaded)
+        if not available:
+            return [],None,None
+        claimed = available[:batch_size]
+        lease_id = secrets.token_hex(4)
+        lease_file = lease_dir / f"{prefix}{lease_id}.lease"
+        writeLease(lease_file,{"id":lease_id,"operator":operator,"location":location,"date":date,"expires":expires,"accessions":claimed})
+        print(f"\tClaimed {len(claimed)} of {len(available)} unleased accessions ({len(leased)} already leased): {lease_file.name}")
+        return claimed,lease_file,lease_id
+    finally:
+        releaseLeaseLock(lock_file,token)
+
+def releaseLeases(lease_files):
+    """Removes lease files once their accessions have been saved to accession_info"""
+
+    for lease_file in lease_files:
+        if lease_file.exists():
+            lease_file.unlink()
 
 def getSelectionAsFile(runthrough,runthroughs,new_seqs,download_limit,downloads:Path):
     """Writes temp file of desired accessions to request from GISAID"""
@@ -311,7 +661,7 @@ def checkSelectionSize(selection_size,filetype_choices,get_epi_set):
     if get_epi_set:
         return get_epi_set,filetype_choices
     if "ackno" in filetype_choices and selection_size > 500:
-        choice = input("Your sample set has more than 500 samples, so you cannot download an acknowledgement file.\nWould you prefer to:\
+        choice = ask("Your sample set has more than 500 samples, so you cannot download an acknowledgement file.\nWould you prefer to:\
             \n\t1 - request an EPI_SET at the end\
             \n\t2 - skip the acknowledgement file and skip the EPI_SET\
             \n\t3 - cancel run\n>")
@@ -339,10 +689,11 @@ def acquireEpiSet(date,epicov_files,downloads):
                     out.write(line)
     click("EPI_SET")
     click("Choose file")
-    print("\tIf 'Choose file' button not present, go back out, click 'Search', and try again from 'EPI_SET'.")
-    print("\tSelect your file.")
+    note("If 'Choose file' button not present, go back out, click 'Search', and try again from 'EPI_SET'.")
+    note("Select your file.")
+    emitStep("upload_selection",path=outfile)
     click("Generate")
-    print("\tFollow the prompts out.")
+    note("Follow the prompts out.")
 
 def isFasta(fh):
     """Returns True if file loooks like a nucleotide sequence fasta, else False"""
@@ -393,48 +744,166 @@ def looksLikeCorrectFile(file_type,file,fields=None):
             elif file_type == "meta":
                 return isCorrectTsv(fh,fields)
 
-def downloadFiles(filetype_choices,meta_files,date,runthrough,outdir,downloads,location,selection_size,get_epi_set):
-    """Guides the downloading of desired files, renaming them appropriately"""
+def countRecords(file_type,file,buffer_size=8*1024*1024):
+    """Returns the number of sequences (fasta), rows (meta), or pages (ackno) in `file`"""
+
+    if file_type == "ackno":
+        return len(PdfReader(file).pages)
+    count = 0
+    previous = b"\n"
+    with open(file,"rb") as fh:
+        while 1:
+            chunk = fh.read(buffer_size)
+            if not chunk: break
+            if file_type == "fasta":
+                count += chunk.count(b"\n>") + (previous == b"\n" and chunk[:1] == b">")
+            else:
+                count += chunk.count(b"\n")
+            previous = chunk[-1:]
+    if file_type == "meta":
+        # don't count the header, but do count a last row without a trailing newline
+        count += (previous != b"\n") - 1
+    return count
+
+def isComplete(file_type,file,tail_size=1024*1024):
+    """Returns True if `file` doesn't look cut short: it ends with a newline and (for fastas) its last record has a sequence"""
+
+    if file_type == "ackno": return True # pypdf already fails on truncated pdfs
+    size = file.stat().st_size
+    with open(file,"rb") as fh:
+        fh.seek(max(0,size - tail_size))
+        tail = fh.read()
+    if not tail.endswith(b"\n"):
+        print(f"\t{file.name} does not end with a newline - it looks incomplete")
+        return False
+    if file_type == "fasta":
+        last_line = tail.rstrip(b"\r\n").rsplit(b"\n",1)[-1]
+        if last_line.startswith(b">"):
+            print(f"\tThe last record in {file.name} has no sequence - it looks incomplete")
+            return False
+    return True
+
+def checkFile(file_type,file,fields=None,cache=None,expected_records=None,selection_id=None):
+    """Returns True if `file` looks like the correct, complete file, skipping the checks if `cache` shows it's unchanged since last time
+
+    For fastas and metadata, the number of records must also equal `expected_records` (if provided), unless that
+    file's record count was already accepted (see `downloadFiles`). If `cache` shows `file` was downloaded for
+    another selection than `selection_id`, it's rejected. New results (with record counts for valid files and
+    the selection) are saved to `cache`.
+    """
+
+    entry = cache.lookup(file,file_type) if cache else None
+    if entry:
+        valid,records = entry["valid"],entry["records"]
+        if valid and selection_id and entry.get("selection_id") not in (None,selection_id):
+            print(f"\t{file.name} was downloaded for a different selection of accessions")
+            return False
+    else:
+        valid = looksLikeCorrectFile(file_type=file_type,file=file,fields=fields) and isComplete(file_type,file)
+        records = countRecords(file_type,file) if valid else None
+        if cache: cache.record(file,file_type,valid,records,selection_id=selection_id)
+    accepted = entry and entry.get("accepted")
+    if valid and expected_records is not None and file_type != "ackno" and records != expected_records and not accepted:
+        print(f"\t{file.name} has {records} records, but {expected_records} were selected")
+        return False
+    return valid
+
+def selectionId(selection_file:Path):
+    """Returns an id for the set of accessions in `selection_file` (the same regardless of their order)"""
+
+    accessions = sorted(selection_file.read_text().split())
+    return hashlib.blake2b("\n".join(accessions).encode(),digest_size=16).hexdigest()
+
+# columns expected in each metadata table (by its label in GISAID's download menu)
+meta_fields = {
+    "Dates and Location":["Accession ID","Collection date","Submission date","Location"],
+    "Patient status metadata":["Virus name","Accession ID","Collection date","Location","Host","Additional location information"," Sampling strategy","Gender","Patient age","Patient status","Last vaccinated","Passage","Specimen","Additional host information","Lineage","Clade","AA Substitutions"],
+    "Sequencing technology metadata":["Virus name","Accession ID","Collection date","Location","Host","Passage","Specimen","Additional host information","Sequencing technology","Assembly method","Comment","Comment type","Lineage","Clade","AA Substitutions"],
+}
+
+def writeFastaQC(fasta:Path,qc_vars:VariableHolder=None):
+    """Writes a per-accession QC table alongside `fasta` and prints a summary of it"""
+
+    from gisaid_download import qc
+    if qc.np is None:
+        print("\tSkipping fasta QC (requires numpy)")
+        return
+    min_length = getattr(qc_vars,"min_length",0)
+    max_n_fraction = getattr(qc_vars,"max_n_fraction",0.3)
+    qc_file,records,failed = qc.fastaQC(fasta,min_length=min_length,max_n_fraction=max_n_fraction)
+    print(f"\tQC: {failed} of {records} sequences failed (length < {min_length} or N fraction > {max_n_fraction}) - see {qc_file}")
+    if records and failed / records > 0.5:
+        print(f"\tWARNING: most sequences in {fasta.name} failed QC")
+
+def downloadFiles(filetype_choices,meta_files,date,runthrough,outdir,downloads,location,selection_size,get_epi_set,run_label=None,qc_vars=None,selection_id=None):
+    """Guides the downloading of desired files, renaming them appropriately
+
+    If a download has the wrong number of records twice in a row (like when GISAID no longer provides
+    some selected accessions), it's kept with a warning rather than requested again forever.
+    """
 
     get_epi_set,filetype_choices = checkSelectionSize(selection_size,filetype_choices,get_epi_set)
+    if run_label is None: run_label = runthrough
 
     file_info = {
         "fasta":[
-            {"label":"Nucleotide Sequences (FASTA)","fn":f"gisaid_{location}_{date}.{runthrough}.fasta","abbr":"fasta"}],
+            {"label":"Nucleotide Sequences (FASTA)","fn":f"gisaid_{location}_{date}.{run_label}.fasta","abbr":"fasta"}],
         "meta":[
-            {"label":"Dates and Location","fn":f"gisaid_date_{location}_{date}.{runthrough}.tsv","abbr":"date & location","filetypes_abbr":"date_loc",
-            "fields":["Accession ID","Collection date","Submission date","Location"]},
-            {"label":"Patient status metadata","fn":f"gisaid_pat_{location}_{date}.{runthrough}.tsv","abbr":"patient status","filetypes_abbr":"patient",
-            "fields":["Virus name","Accession ID","Collection date","Location","Host","Additional location information"," Sampling strategy","Gender","Patient age","Patient status","Last vaccinated","Passage","Specimen","Additional host information","Lineage","Clade","AA Substitutions"]},
-            {"label":"Sequencing technology metadata","fn":f"gisaid_seq_{location}_{date}.{runthrough}.tsv","abbr":"sequence tech","filetypes_abbr":"seq_tech",
-            "fields":["Virus name","Accession ID","Collection date","Location","Host","Passage","Specimen","Additional host information","Sequencing technology","Assembly method","Comment","Comment type","Lineage","Clade","AA Substitutions"]}],
+            {"label":"Dates and Location","fn":f"gisaid_date_{location}_{date}.{run_label}.tsv","abbr":"date & location","filetypes_abbr":"date_loc",
+            "fields":meta_fields["Dates and Location"]},
+            {"label":"Patient status metadata","fn":f"gisaid_pat_{location}_{date}.{run_label}.tsv","abbr":"patient status","filetypes_abbr":"patient",
+            "fields":meta_fields["Patient status metadata"]},
+            {"label":"Sequencing technology metadata","fn":f"gisaid_seq_{location}_{date}.{run_label}.tsv","abbr":"sequence tech","filetypes_abbr":"seq_tech",
+            "fields":meta_fields["Sequencing technology metadata"]}],
         "ackno":[
-            {"label":"Acknowledgement table","fn":f"gisaid_ackno_{location}_{date}.{runthrough}.pdf","abbr":"ack_pdfnew"}]
+            {"label":"Acknowledgement table","fn":f"gisaid_ackno_{location}_{date}.{run_label}.pdf","abbr":"ack_pdfnew"}]
     }
     # download all desired files
+    from gisaid_download.validation_cache import ValidationCache
+    cache = ValidationCache(outdir)
     for file_type in filetype_choices:
         done_once = False
         for file_dict in file_info[file_type]:
             name = Path(file_dict["fn"])
             runinfo = f"{location} {file_dict['label']} #{runthrough}"
-            if not outdir.joinpath(name).exists():
-                if file_type == "meta":
-                    if file_dict["filetypes_abbr"] not in meta_files:
-                        continue
+            if file_type == "meta":
+                if file_dict["filetypes_abbr"] not in meta_files:
+                    continue
+            # don't trust existing files (possibly left over from a crash) unless they pass (or already passed) validation
+            existing = outdir.joinpath(name)
+            if existing.exists() and not checkFile(file_type,existing,file_dict.get("fields"),cache,selection_size,selection_id):
+                print(f"\n\tExisting {runinfo} does not look like a complete {file_dict['label']} file - removing it to download again:\n\t\t{existing}")
+                existing.unlink()
+            if not existing.exists():
                 if runthrough == 0 and done_once == False:
                     click("OK (twice)")
                     done_once = True
                 print(f"\nPreparing to download {runinfo}\n")
                 # loop through download - if it looks like user got wrong file, try again
+                mismatched_records = None
                 while 1:
                     click("Download")
                     outfile = downloadFileAs(outbase=name,outdir=outdir,downloads=downloads,action=click,action_input=(file_dict["label"],"circle"),action2=click,action2_input="Download",runthrough=runthrough)
-                    if looksLikeCorrectFile(file_type=file_type,file=outfile,fields=file_dict.get("fields")):
+                    if checkFile(file_type,outfile,file_dict.get("fields"),cache,selection_size,selection_id):
+                        if file_type == "fasta": writeFastaQC(outfile,qc_vars)
+                        break
+                    # a complete file with the same (wrong) number of records twice in a row is what GISAID has to offer
+                    entry = cache.lookup(outfile,file_type)
+                    records = entry["records"] if entry and entry["valid"] else None
+                    if records is not None and records == mismatched_records:
+                        print(f"\nWARNING: {outfile.name} has {records} records again, but {selection_size} were selected - keeping it (GISAID may no longer provide some of them).\n")
+                        cache.record(outfile,file_type,True,records,selection_id=selection_id,accepted=True)
+                        if file_type == "fasta": writeFastaQC(outfile,qc_vars)
                         break
-                    else:
-                        outfile.unlink()
-                        print(f"\nWARNING: The file you downloaded does not match the typical traits of a {file_dict['label']} file. See above for more. \nTry again.\n")
-            else: print(f"\t{runinfo} already exists in {outdir}")
+                    mismatched_records = records
+                    outfile.unlink()
+                    print(f"\nWARNING: The file you downloaded does not match the typical traits of a complete {file_dict['label']} file. See above for more. \nTry again.\n")
+            else:
+                print(f"\t{runinfo} already exists in {outdir}")
+                # an earlier run may have stopped (or lacked numpy) before QC was written
+                qc_file = existing.with_suffix(".qc.tsv")
+                if file_type == "fasta" and (not qc_file.exists() or qc_file.stat().st_mtime < existing.stat().st_mtime):
+                    writeFastaQC(existing,qc_vars)
     return get_epi_set
 
 def getEpicovAcessionFile(all_gisaid_seqs_name,accession_dir,location,location_long,downloads,date,wait):
@@ -452,8 +921,8 @@ def getEpicovAcessionFile(all_gisaid_seqs_name,accession_dir,location,location_l
             print(f"\nNeed to download data for {location_long}\n")
             fill("Location",location_long,wait=wait)
             print(f"Determining which sequences need to be downloaded for {location}\n")
-            print("\tIf not done already:")
-            print("\tCheck the select-all checkbox next to 'Virus name' - it's not labeled")
+            print("\tIf not done already, check the (unlabeled) select-all checkbox next to 'Virus name':")
+            click("Virus name select-all","checkbox")
             click("Select")
             downloadFileAs(
                 outbase=all_gisaid_seqs,
@@ -471,13 +940,11 @@ def add_filter_step(action:str,date):
         action (str): a function to execute
     """
 
-    # only conduct allowed actions
+    # only conduct allowed actions (with print() sent along as a note, like any other free text)
     if action.split("(",1)[0] in allowed_actions:
-        if action.startswith("print("):
-            print("\t",end='')
-        exec(action)
+        exec(action,globals(),{"date":date,"print":note})
     else:
-        print(f"\t{action}")
+        note(action)
 
 def prepareFilters(date,custom_filters=None):
     """Directs which filters need to be selected (based on the UNC Charlotte Environmental Monitoring Laboratory's standards)"""
@@ -502,13 +969,36 @@ def save_accessions(new_seq_files,accession_dir):
     for file in new_seq_files:
         if file.exists():
             print("moving",file,"to",accession_dir.joinpath(file.name))
-            file.rename(accession_dir.joinpath(file.name))
+            moveFile(file,accession_dir.joinpath(file.name))
+
+def guideSelection(location,runthrough,selection_file,wait):
+    """Guides user through inputting the current selection file into GISAID"""
 
-def download_data(locations,date,downloads,accession_dir,filetype_choices,meta_files,outdir,wait,get_epi_set,custom_filters):
-    """Guided download of requested data for each location requested"""
+    print(f"\n\n##################  {location} runthrough {runthrough + 1}  ##################\n")
+    print("\nRefresh the page:\n")
+    note("Navigate out by clicking 'Back' or 'OK', as needed")
+    click("Search")
+    click("Select")
+    print(f'\nLook in your "Downloads" folder for:\t"temp_selection"\n')
+    click("Choose file")
+    print(f"\tInput selections from {selection_file} (Choose File)")
+    emitStep("upload_selection",path=selection_file)
+    click("OK (twice)")
+    print("\tor\n\tskip this runthrough (if you know these files already exist)")
+    awaitEnter(wait=wait)
+
+def download_data(locations,date,downloads,accession_dir,filetype_choices,meta_files,outdir,wait,get_epi_set,custom_filters,operator=None,lease_dir=None,lease_minutes=240,qc_vars=None,daemon_socket=None,ssh_vars=None,scripter=None):
+    """Guided download of requested data for each location requested
+
+    If `scripter` is set, new accessions are determined on the cluster rather than against the local accession_info.
+
+    If `operator` is set, batches of new accessions are claimed via leases in `lease_dir` so that
+    multiple operators sharing an epicov_dir download disjoint sets of accessions.
+    """
 
     epicov_files = []
     new_seq_files = []
+    lease_files = []
     download_limit = 10000 #This is the limit imposed by GISAID
 
     for location in locations:
@@ -517,49 +1007,81 @@ def download_data(locations,date,downloads,accession_dir,filetype_choices,meta_f
         location_long = getState(location)
 
         all_gisaid_seqs_name = Path(f"all_{location}_epicovs_{date}.csv")
-        new_seq_file = downloads.joinpath(f"new_seqs_{location}_{date}.csv")
+        if operator: new_seq_file = downloads.joinpath(f"new_seqs_{location}_{date}.{operator}.csv")
+        else: new_seq_file = downloads.joinpath(f"new_seqs_{location}_{date}.csv")
 
         # download full, current accession list if needed
         all_gisaid_seqs = getEpicovAcessionFile(all_gisaid_seqs_name,accession_dir,location,location_long,downloads,date,wait)
 
-        new_seq_list = getNewAccessions(
-            # local_seqs=outdir.joinpath("epi_isls_overall.tsv"),
-            accession_dir=accession_dir,
-            all_gisaid_seqs=all_gisaid_seqs,
-            new_seqs=new_seq_file)
+        if scripter:
+            new_seq_list = getNewAccessionsRemotely(ssh_vars,scripter,all_gisaid_seqs,new_seq_file)
+        else:
+            new_seq_list = getNewAccessions(
+                # local_seqs=outdir.joinpath("epi_isls_overall.tsv"),
+                accession_dir=accession_dir,
+                all_gisaid_seqs=all_gisaid_seqs,
+                new_seqs=new_seq_file,
+                daemon_socket=daemon_socket)
 
         # save fn for later use
         epicov_files.append(all_gisaid_seqs)
-        if len(new_seq_list) > 0: new_seq_files.append(new_seq_file)
 
         # download files if user requested them (and if there are any new sequences)
-        if len(new_seq_list) > 0:
-            runthroughs = int(len(new_seq_list)/download_limit) + 1
+        if len(new_seq_list) > 0 and operator:
+            # claim disjoint batches until all new accessions are leased (or saved) by someone
+            runthrough = 0
+            while 1:
+                selection,lease_file,lease_id = claimAccessions(lease_dir,accession_dir,new_seq_list,download_limit,operator,location,date,held=lease_files,lease_minutes=lease_minutes)
+                if not selection: break
+                lease_files.append(lease_file)
+                selection_file,selection_size = getSelectionAsFile(0,1,selection,download_limit,downloads)
+                guideSelection(location,runthrough,selection_file,wait)
+                # name outputs by lease so they always match the accessions that were claimed
+                get_epi_set = downloadFiles(filetype_choices,meta_files,date,runthrough,outdir,downloads,location,selection_size,get_epi_set,run_label=f"{operator}.{lease_id}",qc_vars=qc_vars,selection_id=selectionId(selection_file))
+                # only record the accessions this operator actually downloaded
+                lease_seq_file = downloads.joinpath(f"new_seqs_{location}_{date}.{operator}.{lease_id}.csv")
+                lease_seq_file.write_text("".join(f"{id}\n" for id in selection))
+                new_seq_files.append(lease_seq_file)
+                runthrough += 1
+            if runthrough == 0: print("All new seqs are already leased by other operators for", location_long)
+            # only the per-lease files are saved to accession_info, so the full list of new seqs isn't needed anymore
+            if new_seq_file.exists(): new_seq_file.unlink()
+        elif len(new_seq_list) > 0:
+            new_seq_files.append(new_seq_file)
+            runthroughs = math.ceil(len(new_seq_list)/download_limit)
             for runthrough in range(runthroughs):
                 # get selections to input (file will be in Downloads)
                 selection_file,selection_size = getSelectionAsFile(runthrough,runthroughs,new_seq_list,download_limit,downloads)
-                print(f"\n\n##################  {location} runthrough {runthrough + 1}  ##################\n")
-                print("\nRefresh the page:\n")
-                print("\tNavigate out by clicking 'Back' or 'OK', as needed")
-                click("Search")
-                click("Select")
-                print(f'\nLook in your "Downloads" folder for:\t"temp_selection"\n')
-                click("Choose file")
-                print(f"\tInput selections from {selection_file} (Choose File)")
-                click("OK (twice)")
-                print("\tor\n\tskip this runthrough (if you know these files already exist)")
-                awaitEnter(wait=wait)
-
-                get_epi_set = downloadFiles(filetype_choices,meta_files,date,runthrough,outdir,downloads,location,selection_size,get_epi_set)
+                guideSelection(location,runthrough,selection_file,wait)
+
+                get_epi_set = downloadFiles(filetype_choices,meta_files,date,runthrough,outdir,downloads,location,selection_size,get_epi_set,qc_vars=qc_vars,selection_id=selectionId(selection_file))
         elif len(new_seq_list) == 0:
             print("No new seqs available to be downloaded for", location_long)
             continueFromHere()
         print(f"\nDone aquiring {location_long} data.\n")
-    return epicov_files,new_seq_files,get_epi_set
+    return epicov_files,new_seq_files,get_epi_set,lease_files
+
+def checkCredentials(login_config):
+    """Exits unless `login_config` (default: hpc-interact's ~/.pooPatrol/hpc_config.txt) holds a username and password"""
+
+    config = Path(login_config).expanduser() if login_config else Path.home() / ".pooPatrol/hpc_config.txt"
+    credentials = {}
+    if config.exists():
+        for line in config.read_text().splitlines():
+            key,_,value = line.partition("=")
+            credentials[key.strip().lower()] = value.strip()
+    if not (credentials.get("username") and credentials.get("password")):
+        warn(f"No saved cluster credentials found in {config}, and they can't be asked for while steps go to an automation driver (--protocol jsonl).\n"
+            "Save them there first (like 'username=myuser' and 'password=mypass' on separate lines).")
 
 def getScripter(ssh_vars:VariableHolder,mode="sftp"):
-    """Instantiates a Scripter object for ssh/sftp interactions with the cluster"""
+    """Instantiates a Scripter object for ssh/sftp interactions with the cluster (or a local stand-in if `site` is 'localhost')"""
 
+    if ssh_vars.site == "localhost":
+        from gisaid_download.local_scripter import LocalScripter
+        return LocalScripter(mode=mode)
+    # hpc-interact asks for any missing credentials itself, which would read the driver's acknowledgements instead
+    if not interactive: checkCredentials(ssh_vars.login_config)
     return Scripter(site=ssh_vars.site, mode=mode, group=ssh_vars.group, save_credentials=ssh_vars.save_credentials, config=ssh_vars.login_config)
 
 def upload_data(ssh_vars:VariableHolder,scripter:Scripter,date:str):
@@ -606,7 +1128,13 @@ def main():
       * with config (default config: ./gisaid_config.ini):
       `python gisaid_download.py 2022-04-06 -c /path/to/config_file.ini`
     """
-    date,locations,downloads,filetype_choices,meta_files,get_epi_set,epicov_dir,ssh_vars,wait,skip_local_update,followup_command,cluster_interact,custom_filters,example,outdir = getVariables()
+    # run as a resident server instead, if requested
+    if sys.argv[1:2] == ["serve"]:
+        from gisaid_download import daemon
+        daemon.main()
+        return
+
+    date,locations,downloads,filetype_choices,meta_files,get_epi_set,epicov_dir,ssh_vars,wait,skip_local_update,followup_command,cluster_interact,custom_filters,example,outdir,operator,lease_minutes,qc_vars,remote_diff,server_socket,driver = getVariables()
 
     # get example config and exit, if requested
     if example:
@@ -614,24 +1142,38 @@ def main():
         file_getter.get_example_config(outdir)
         exit()
 
+    # let an automation driver (rather than a person) do each step, if requested
+    if driver:
+        step_handlers.append(driver.handle)
+        wait = False
+
     # set and make storage directories if needed
     local_accession_dir = Path(f"{epicov_dir}/accession_info")
     meta_dir = Path(f"{epicov_dir}/gisaid_metadata")
+    lease_dir = Path(f"{epicov_dir}/accession_leases")
     for outdir in (local_accession_dir,meta_dir): outdir.mkdir(exist_ok=True,parents=True)
 
+    # use `gisaid_download serve` (with its warm accession index), if it's running
+    from gisaid_download import daemon
+    daemon_socket = server_socket or Path(epicov_dir) / daemon.socket_name
+    if not daemon.request(daemon_socket,{"request":"ping"},timeout=5): daemon_socket = None
+
     # update local copy of downloaded accessions
     if cluster_interact:
         scripter = getScripter(ssh_vars)
-        if not skip_local_update: update_accessions(ssh_vars,scripter)
-        else: print("Skipping cluster/local data update")
+        if skip_local_update: print("Skipping cluster/local data update")
+        elif remote_diff: print("Skipping cluster/local data update - new accessions will be determined on the cluster")
+        elif not (daemon_socket and daemon.request(daemon_socket,{"request":"update"},timeout=daemon.update_timeout)):
+            update_accessions(ssh_vars,scripter)
 
     print(f"\nGuiding you through downloading EpiCoV data up through {date}\n")
-    print("\tGo to https://www.epicov.org/epi3/frontend and log in.")
+    note("Go to https://www.epicov.org/epi3/frontend and log in.")
     awaitEnter(wait=wait)
 
     # get any/all desired data from GISAID
     if filetype_choices:
-        epicov_files,new_seq_files,get_epi_set = download_data(locations,date,downloads,local_accession_dir,filetype_choices,meta_files,meta_dir,wait,get_epi_set,custom_filters)
+        remote_scripter = scripter if cluster_interact and remote_diff else None
+        epicov_files,new_seq_files,get_epi_set,lease_files = download_data(locations,date,downloads,local_accession_dir,filetype_choices,meta_files,meta_dir,wait,get_epi_set,custom_filters,operator,lease_dir,lease_minutes,qc_vars,daemon_socket,ssh_vars,remote_scripter)
 
     # get epi_set for all current acccesions if requested
     if get_epi_set: acquireEpiSet(date,epicov_files,downloads)
@@ -639,6 +1181,8 @@ def main():
     # save accessions of new data to accession_info (this is last so that it only happens if script completes)
     print(f'Saving new sequences downloaded this run to "{local_accession_dir}"')
     save_accessions(new_seq_files,local_accession_dir)
+    # only now can other operators see these accessions as downloaded, so give up the leases on them
+    if operator: releaseLeases(lease_files)
 
     if cluster_interact:
         # upload data to the cluster via sftp
@@ -648,5 +1192,7 @@ def main():
         if followup_command:
             run_followup_cluster_command(scripter,followup_command,date)
 
+    emitStep("finished")
+
 if __name__ == "__main__":
     main()
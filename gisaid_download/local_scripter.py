@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import shutil
+import subprocess
+from pathlib import Path
+
+class LocalScripter:
+    """A stand-in for hpc_interact's Scripter where the "cluster" is the local machine
+
+    sftp-mode `put`/`get` steps become file copies and ssh-mode steps become local shell commands.
+    Used when the config's `site` is 'localhost', so cluster interactions can be tested without a cluster.
+    """
+
+    def __init__(self,mode="sftp",**kwargs) -> None:
+        self.actions = []
+        self.reset_mode(mode)
+
+    def reset_mode(self,mode,clear=True):
+        """Sets mode (sftp or ssh) and clears any actions"""
+
+        if clear: self.actions = []
+        self.mode = mode
+
+    def add_step(self,cmd,expect=None):
+        """Adds a shell command to be run"""
+
+        self.actions.append(("run",cmd))
+
+    def copy(self,file,outdir,new_name=None):
+        """Copies `file` (which may end in a '*' glob) to `outdir` - either may be double-quoted, as in sftp"""
+
+        file,outdir = (Path(str(path).strip('"')) for path in (file,outdir))
+        outdir.mkdir(parents=True,exist_ok=True)
+        if "*" in file.name:
+            for f in file.parent.glob(file.name):
+                if f.is_file(): shutil.copy2(f,outdir/f.name)
+        else:
+            shutil.copy2(file,outdir/(new_name or file.name))
+
+    def get(self,file,outdir=None,new_name=None,options:list=[]):
+        """Adds a step copying `file` from the (local) cluster to `outdir`"""
+
+        if self.mode != "sftp": raise Exception("'get' can only be used with mode='sftp'")
+        self.actions.append(("copy",file,outdir or Path("."),new_name))
+
+    def put(self,file,outdir=None,new_name=None,options:list=[],set_permissions=False):
+        """Adds a step copying `file` to `outdir` on the (local) cluster"""
+
+        if self.mode != "sftp": raise Exception("'put' can only be used with mode='sftp'")
+        self.actions.append(("copy",file,outdir or Path("."),new_name))
+
+    def preview_steps(self):
+        """Prints all action steps in order to stdout"""
+
+        print("\nCommand preview (local):")
+        for action in enumerate(self.actions):
+            print(action)
+
+    def run(self):
+        """Runs all steps currently in self.actions"""
+
+        for action in self.actions:
+            if action[0] == "copy":
+                self.copy(*action[1:])
+            else:
+                subprocess.run(action[1],shell=True,check=True)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+class StepProtocol:
+    """Sends guided steps as JSON lines to an automation driver and waits for each to be acknowledged
+
+    Each step is written as one line, like:
+        {"id": 3, "step": "click", "item": "Download", "item_type": "button"}
+    and the driver must reply with one line once it has done the step:
+        {"id": 3, "ok": true}
+    A reply of {"id": 3, "ok": false, "error": "..."} stops the run.
+
+    Steps:
+        click: click `item` (a `item_type` like "button", "checkbox", or "circle")
+        fill: fill in `item` as `content`
+        upload_selection: choose file `path` in the file upload dialog
+        expect_download: the tool is now waiting for a file with extension `suffix` in the downloads directory
+        note: a free-text instruction (`message`) with no typed step - handle it (or fail) before acknowledging
+        finished: all steps are done
+    """
+
+    def __init__(self,reader,writer) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.count = 0
+
+    def handle(self,step,details):
+        """Sends `step` with its `details` and waits for the driver's acknowledgement"""
+
+        self.count += 1
+        event = {"id":self.count,"step":step}
+        event.update({k:(str(v) if isinstance(v,Path) else v) for k,v in details.items()})
+        self.writer.write(json.dumps(event) + "\n")
+        self.writer.flush()
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError(f"Automation driver disconnected before acknowledging step {self.count} ({step})")
+        reply = json.loads(line)
+        if reply.get("id") != self.count:
+            raise ConnectionError(f"Expected acknowledgement of step {self.count} ({step}) but got: {line.strip()}")
+        if not reply.get("ok"):
+            raise RuntimeError(f"Automation driver failed step {self.count} ({step}): {reply.get('error')}")
+
+def stdioProtocol():
+    """Returns a StepProtocol over stdin/stdout
+
+    Since stdout now carries the protocol, all other output (meant for people) is redirected to stderr - at the file
+    descriptor level, so output from subprocesses (like hpc_interact's `expect` calls) can't end up in the protocol either.
+    """
+
+    sys.stdout.flush()
+    protocol_fd = os.dup(1)
+    os.dup2(2,1)
+    return StepProtocol(sys.stdin,os.fdopen(protocol_fd,"w"))
+
+def unixSocketProtocol(socket_path:Path):
+    """Returns a StepProtocol over the first connection to a Unix socket at `socket_path`"""
+
+    socket_path = Path(socket_path)
+    if socket_path.exists(): socket_path.unlink()
+    server = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    server.listen(1)
+    print(f"Waiting for an automation driver to connect to {socket_path}")
+    connection,_ = server.accept()
+    server.close()
+    socket_path.unlink()
+    return StepProtocol(connection.makefile("r"),connection.makefile("w"))
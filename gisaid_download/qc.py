@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+from pathlib import Path
+try:
+    # only required for fasta QC
+    import numpy as np
+except ImportError:
+    np = None
+
+# byte classes: 0 - not sequence (whitespace), 1 - A/T/U, 2 - G/C, 3 - N, 4 - other IUPAC ambiguity codes, 5 - anything else (like gaps)
+AT,GC,N,AMBIGUOUS,OTHER = 1,2,3,4,5
+qc_columns = ["accession","virus_name","length","n_fraction","ambiguous_fraction","gc_content","pass"]
+
+def byteClasses():
+    """Returns a lookup table from byte value to byte class"""
+
+    lut = np.full(256, OTHER, dtype=np.uint8)
+    for chars,cls in ((b" \t\r\n",0),(b"ATUatu",AT),(b"GCgc",GC),(b"Nn",N),(b"RYKMSWBDHVrykmswbdhv",AMBIGUOUS)):
+        lut[list(chars)] = cls
+    return lut
+
+def iterRecordBlocks(fasta:Path,buffer_size=16*1024*1024):
+    """Yields chunks of `fasta` (bytes) of roughly `buffer_size`, each ending on a record boundary"""
+
+    carry = b""
+    with open(fasta,"rb") as fh:
+        while 1:
+            chunk = fh.read(buffer_size)
+            if not chunk:
+                if carry: yield carry
+                return
+            data = carry + chunk
+            cut = data.rfind(b"\n>")
+            if cut == -1:
+                carry = data
+            else:
+                yield data[:cut+1]
+                carry = data[cut+1:]
+
+def blockStats(block:bytes,lut):
+    """Returns headers and per-record counts of sequence length, A/T, G/C, N, and ambiguous bases for all records in `block`"""
+
+    arr = np.frombuffer(block, dtype=np.uint8)
+    line_starts = np.empty(len(arr), dtype=bool)
+    line_starts[0] = True
+    np.equal(arr[:-1], ord("\n"), out=line_starts[1:])
+    starts = np.flatnonzero(line_starts & (arr == ord(">")))
+    if not len(starts):
+        return [],{}
+    newlines = np.append(np.flatnonzero(arr == ord("\n")), len(arr))
+    ends = newlines[np.searchsorted(newlines, starts)]
+
+    # mask out headers: +1 where each starts, -1 where each ends
+    markers = np.zeros(len(arr) + 1, dtype=np.int8)
+    markers[starts] = 1
+    markers[ends] -= 1
+    classes = lut[arr]
+    classes[np.cumsum(markers[:-1], dtype=np.int8) > 0] = 0
+
+    counts = {"length":np.add.reduceat(classes > 0, starts, dtype=np.int64)}
+    for name,cls in (("at",AT),("gc",GC),("n",N),("ambiguous",AMBIGUOUS)):
+        counts[name] = np.add.reduceat(classes == cls, starts, dtype=np.int64)
+    headers = [block[start+1:end].decode(errors="replace").strip() for start,end in zip(starts.tolist(),ends.tolist())]
+    return headers,counts
+
+def fastaQC(fasta:Path,outfile:Path=None,min_length=0,max_n_fraction=0.3,buffer_size=16*1024*1024):
+    """Writes a per-accession QC table for `fasta` (default: alongside it, as *.qc.tsv)
+
+    A record passes if it has at least `min_length` bases and no more than `max_n_fraction` Ns.
+
+    Returns:
+        (QC table path, number of records, number of records that failed)
+    """
+
+    if outfile is None: outfile = Path(fasta).with_suffix(".qc.tsv")
+    lut = byteClasses()
+    records = failed = 0
+    with open(outfile,"w") as out:
+        out.write("\t".join(qc_columns) + "\n")
+        for block in iterRecordBlocks(fasta,buffer_size):
+            headers,counts = blockStats(block,lut)
+            if not headers: continue
+            length = counts["length"]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                n_fraction = np.where(length > 0, counts["n"] / length, 1.0)
+                ambiguous_fraction = np.where(length > 0, counts["ambiguous"] / length, 0.0)
+                called = counts["at"] + counts["gc"]
+                gc_content = np.where(called > 0, counts["gc"] / called, 0.0)
+            passed = (length >= min_length) & (length > 0) & (n_fraction <= max_n_fraction)
+            for header,l,n,a,g,p in zip(headers,length.tolist(),n_fraction.tolist(),ambiguous_fraction.tolist(),gc_content.tolist(),passed.tolist()):
+                # GISAID headers look like: hCoV-19/USA/NC-123/2023|EPI_ISL_123|2023-01-01
+                parts = header.split("|")
+                accession = next((part for part in parts if part.startswith("EPI_")), parts[0])
+                out.write(f"{accession}\t{parts[0]}\t{l}\t{n:.4f}\t{a:.4f}\t{g:.4f}\t{p}\n")
+            records += len(headers)
+            failed += int((~passed).sum())
+    return outfile,records,failed
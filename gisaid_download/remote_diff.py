@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""Writes (gzipped) accessions from `all_gisaid_seqs` that aren't in any file in `accession_dir`
+
+This is uploaded to and run on the cluster (by `gisaid_download --remote_diff`), so it only uses the standard library.
+
+Usage:
+    python3 remote_diff.py accession_dir all_gisaid_seqs outfile.gz
+"""
+
+import gzip
+import sys
+from pathlib import Path
+
+def remoteDiff(accession_dir:Path,all_gisaid_seqs:Path,outfile:Path):
+    """Writes accessions in `all_gisaid_seqs` missing from all files in `accession_dir` to gzipped `outfile`
+
+    Returns:
+        number of new accessions
+    """
+
+    new_set = set(Path(all_gisaid_seqs).read_text().splitlines())
+    for f in Path(accession_dir).glob("*"):
+        if f.name.startswith(".") or not f.is_file(): continue
+        new_set -= set(f.read_text().splitlines())
+    new_set.discard("")
+    with gzip.open(outfile,"wt") as out:
+        for id in sorted(new_set):
+            out.write(f"{id}\n")
+    return len(new_set)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        sys.exit(__doc__)
+    count = remoteDiff(*(Path(arg) for arg in sys.argv[1:]))
+    print(f"{count} new accessions written to {sys.argv[3]}")
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from gisaid_download import gisaid_download as gd
+
+def makePDF(text):
+    """Returns bytes of a minimal, valid one-page pdf displaying `text`"""
+
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for i,obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+class GisaidSimulator:
+    """Stands in for a person clicking through GISAID in a browser
+
+    Register `handle` in `gisaid_download.step_handlers` and, whenever the tool waits for a download,
+    a file matching the most recently selected download option appears in `downloads` after `delay` seconds.
+    Downloads pass through a temporary '.part' file, like in a real browser. With probability `mistake_rate`,
+    the wrong file is downloaded and, with probability `partial_rate`, the download is cut short.
+    """
+
+    def __init__(self,downloads:Path,accessions_per_location=1000,delay=0.5,part_delay=0.5,mistake_rate=0.0,partial_rate=0.0,seq_length=29903,seed=None) -> None:
+        self.downloads = Path(downloads)
+        self.accessions_per_location = accessions_per_location
+        self.delay = delay
+        self.part_delay = part_delay
+        self.mistake_rate = mistake_rate
+        self.partial_rate = partial_rate
+        self.random = random.Random(seed)
+        self.reference = "".join(self.random.choice("ACGT") for _ in range(seq_length))
+        self.location = None
+        self.selected = None
+        self.download_count = 0
+        self.mistakes = 0
+        self.partials = 0
+        self.threads = []
+
+    def accessionsFor(self,location):
+        """Returns the (made up) accessions available in GISAID for `location`"""
+
+        names = sorted(gd.states.values())
+        start = (names.index(location) + 1 if location in names else len(names) + 1) * 10_000_000
+        return [f"EPI_ISL_{start + i}" for i in range(self.accessions_per_location)]
+
+    def handle(self,step,details):
+        """Reacts to a guided step from gisaid_download"""
+
+        if step == "fill" and details["item"] == "Location":
+            self.location = details["content"]
+        elif step == "click" and (details["item_type"] == "circle" or details["item"] == "CSV"):
+            self.selected = details["item"]
+        elif step == "expect_download":
+            thread = threading.Thread(target=self.download,args=(self.selected,),daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def selection(self):
+        """Returns accessions in the current temp_selection file"""
+
+        return self.downloads.joinpath("temp_selection").read_text().split()
+
+    def content(self,label,accessions):
+        """Returns bytes of the file GISAID would provide for download option `label`"""
+
+        if label == "CSV":
+            return "".join(f"{id}\n" for id in accessions).encode()
+        elif label == "Nucleotide Sequences (FASTA)":
+            records = []
+            for i,id in enumerate(accessions):
+                # sprinkle in a run of Ns to vary sequence quality
+                n_start = self.random.randrange(len(self.reference))
+                n_length = self.random.randrange(500)
+                seq = self.reference[:n_start] + "N" * n_length + self.reference[n_start+n_length:]
+                records.append(f">hCoV-19/USA/{self.location}-{i}/2023|{id}|2023-01-01\n{seq[:len(self.reference)]}\n")
+            return "".join(records).encode()
+        elif label in gd.meta_fields:
+            fields = gd.meta_fields[label]
+            rows = ["\t".join(fields)]
+            for id in accessions:
+                values = {"Accession ID":id,"Collection date":"2023-01-01","Submission date":"2023-01-15","Location":f"North America / USA / {self.location}","Host":"Human"}
+                rows.append("\t".join(values.get(field.strip(),"") for field in fields))
+            return ("\n".join(rows) + "\n").encode()
+        else:
+            return makePDF(f"Acknowledgement table for {len(accessions)} sequences")
+
+    def download(self,label):
+        """Writes out a simulated download of `label` (possibly the wrong one, or incomplete) via a '.part' file"""
+
+        time.sleep(self.delay)
+        if label == "CSV":
+            accessions = self.accessionsFor(self.location)
+            suffix = ".csv"
+        else:
+            accessions = self.selection()
+            suffix = {"Nucleotide Sequences (FASTA)":".fasta","Acknowledgement table":".pdf"}.get(label,".tsv")
+        if label != "CSV" and self.random.random() < self.mistake_rate:
+            # wrong radio button: another metadata table or, for sequences/pdfs, something that isn't
+            self.mistakes += 1
+            label = self.random.choice([other for other in gd.meta_fields if other != label])
+        content = self.content(label,accessions)
+        # the accessions CSV isn't validated by gisaid_download (it has no header or expected size to check against),
+        # so cutting it short would just shrink the selection rather than exercise the download checks
+        if label != "CSV" and self.random.random() < self.partial_rate:
+            self.partials += 1
+            content = content[:self.random.randrange(1,len(content))]
+        self.download_count += 1
+        outfile = self.downloads / f"gisaid_hcov-19_{self.download_count}{suffix}"
+        part_file = outfile.with_name(outfile.name + ".part")
+        part_file.write_bytes(content[:len(content)//2])
+        time.sleep(self.part_delay)
+        part_file.write_bytes(content)
+        part_file.rename(outfile)
+
+def outputAccessions(file_type,file):
+    """Returns the accessions listed in an output fasta (from headers) or metadata table (from the 'Accession ID' column)"""
+
+    accessions = []
+    with open(file) as fh:
+        if file_type == "fasta":
+            for line in fh:
+                if line.startswith(">"):
+                    accessions += [field for field in line.strip().split("|") if field.startswith("EPI_")][:1]
+        else:
+            header = [field.strip() for field in fh.readline().rstrip("\n").split("\t")]
+            if "Accession ID" not in header: return accessions
+            column = header.index("Accession ID")
+            for line in fh:
+                row = line.rstrip("\n").split("\t")
+                if len(row) > column: accessions.append(row[column])
+    return accessions
+
+def verifyOutputs(meta_dir:Path,date,expected:dict,filetype_choices,meta_files):
+    """Checks that, for each location, the output files of each type hold exactly the `expected` (new) accessions
+
+    Returns:
+        dict with the number of files `checked`, `wrong` (unexpected or duplicate accessions), and `truncated`,
+        plus a list of `problems` describing every mismatch
+    """
+
+    prefixes = []
+    if "fasta" in filetype_choices: prefixes.append(("fasta","gisaid_{}_{}.*.fasta"))
+    if "meta" in filetype_choices:
+        prefixes += [("meta",f"gisaid_{prefix}_{{}}_{{}}.*.tsv") for abbr,prefix in (("date_loc","date"),("patient","pat"),("seq_tech","seq")) if abbr in meta_files]
+    results = {"checked":0,"wrong":0,"truncated":0,"problems":[]}
+    for location,accessions in expected.items():
+        for file_type,pattern in prefixes:
+            found = []
+            for file in sorted(meta_dir.glob(pattern.format(location,date))):
+                results["checked"] += 1
+                if not gd.isComplete(file_type,file):
+                    results["truncated"] += 1
+                    results["problems"].append(f"{file.name} is truncated")
+                file_accessions = outputAccessions(file_type,file)
+                unexpected = set(file_accessions) - accessions
+                duplicates = len(file_accessions) - len(set(file_accessions))
+                if unexpected or duplicates:
+                    results["wrong"] += 1
+                    results["problems"].append(f"{file.name} has {len(unexpected)} unexpected and {duplicates} duplicate accessions")
+                found += file_accessions
+            label = pattern.format(location,date)
+            missing = accessions - set(found)
+            if missing:
+                results["problems"].append(f"{len(missing)} of {len(accessions)} new accessions are missing from {label} outputs")
+            if len(found) != len(set(found)):
+                results["problems"].append(f"{len(found) - len(set(found))} accessions appear in more than one {label} output")
+    return results
+
+def simulate(locations,date,workdir:Path,filetypes=("fasta","meta"),already_downloaded=0.0,**simulator_args):
+    """Runs `gisaid_download.download_data` non-interactively against a `GisaidSimulator`, then checks its outputs
+
+    Returns:
+        the simulator, the number of seconds the run took, and the results of `verifyOutputs`
+    """
+
+    downloads = workdir / "Downloads"
+    accession_dir = workdir / "epicov" / "accession_info"
+    meta_dir = workdir / "epicov" / "gisaid_metadata"
+    for d in (downloads,accession_dir,meta_dir): d.mkdir(parents=True,exist_ok=True)
+    simulator = GisaidSimulator(downloads,**simulator_args)
+
+    # pretend some accessions were already downloaded in earlier runs
+    expected = {}
+    for location in locations:
+        accessions = simulator.accessionsFor(gd.getState(location))
+        previous = accessions[:int(len(accessions) * already_downloaded)]
+        accession_dir.joinpath(f"new_seqs_{location}_previous.csv").write_text("".join(f"{id}\n" for id in previous))
+        expected[location] = set(accessions[len(previous):])
+
+    filetype_choices,meta_files = gd.determineFileTypesToDownload(filetypes)
+    gd.step_handlers.append(simulator.handle)
+    try:
+        start = time.time()
+        gd.download_data(locations,date,downloads,accession_dir,filetype_choices,meta_files,meta_dir,wait=False,get_epi_set=False,custom_filters=None)
+        elapsed = time.time() - start
+    finally:
+        gd.step_handlers.remove(simulator.handle)
+    return simulator,elapsed,verifyOutputs(meta_dir,date,expected,filetype_choices,meta_files)
+
+def main():
+    """Benchmarks a full, simulated download session"""
+
+    parser = argparse.ArgumentParser(prog="gisaid_download_simulator",
+        description="Times gisaid_download's guided download loop against a simulated GISAID browser session")
+    parser.add_argument("-l","--location",nargs="+",default=["NC"],help="space delimited list of state(s) to simulate (default: NC)")
+    parser.add_argument("-a","--accessions",type=int,default=1000,help="accessions available in GISAID per location (default: 1000)")
+    parser.add_argument("-f","--filetypes",nargs="*",default=["fasta","meta"],help="filetypes to download (default: fasta meta)")
+    parser.add_argument("--already_downloaded",type=float,default=0.0,help="fraction of accessions treated as downloaded in previous runs (default: 0)")
+    parser.add_argument("--delay",type=float,default=0.5,help="seconds before a download starts (default: 0.5)")
+    parser.add_argument("--part_delay",type=float,default=0.5,help="seconds a download spends as a '.part' file (default: 0.5)")
+    parser.add_argument("--mistake_rate",type=float,default=0.0,help="probability the wrong file gets downloaded (default: 0)")
+    parser.add_argument("--partial_rate",type=float,default=0.0,help="probability a download is incomplete (default: 0)")
+    parser.add_argument("--seq_length",type=int,default=29903,help="length of simulated sequences (default: 29903)")
+    parser.add_argument("--seed",type=int,default=None,help="random seed")
+    parser.add_argument("-w","--workdir",type=Path,default=None,help="where to put simulated downloads and outputs (default: a temporary directory that gets removed)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="gisaid_sim_"))
+    try:
+        simulator,elapsed,results = simulate(args.location,"2023-01-01",workdir,args.filetypes,args.already_downloaded,
+            accessions_per_location=args.accessions,delay=args.delay,part_delay=args.part_delay,mistake_rate=args.mistake_rate,
+            partial_rate=args.partial_rate,seq_length=args.seq_length,seed=args.seed)
+    finally:
+        if not args.workdir: shutil.rmtree(workdir)
+    total = args.accessions * len(args.location)
+    new = total - int(args.accessions * args.already_downloaded) * len(args.location)
+    print(f"\nSimulated {new} new (of {total}) accessions in {elapsed:.1f} seconds ({new/elapsed:.1f} new accessions/second)")
+    print(f"\tdownloads: {simulator.download_count} - wrong files: {simulator.mistakes} - incomplete files: {simulator.partials}")
+    print(f"\toutputs checked: {results['checked']} - wrong: {results['wrong']} - truncated: {results['truncated']}")
+    if results["problems"]:
+        print("\nOutputs don't match the new accessions:")
+        for problem in results["problems"]:
+            print(f"\t{problem}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+def fastHash(file:Path,sample_size=1024*1024):
+    """Returns a blake2b hex digest of `file`'s size plus its first and last `sample_size` bytes"""
+
+    size = file.stat().st_size
+    checksum = hashlib.blake2b(str(size).encode())
+    with open(file,"rb") as fh:
+        checksum.update(fh.read(sample_size))
+        if size > sample_size:
+            fh.seek(max(sample_size,size - sample_size))
+            checksum.update(fh.read())
+    return checksum.hexdigest()
+
+class ValidationCache:
+    """Remembers which files in `directory` were validated (and how many records they had), so unchanged files needn't be rechecked
+
+    Entries are stored in `directory`/.validation_cache.json and keyed by file name,
+    then matched against the file's size, mtime, and a fast content hash (see `fastHash`).
+    """
+
+    def __init__(self,directory:Path,cache_name=".validation_cache.json") -> None:
+        self.cache_file = Path(directory) / cache_name
+        self.entries = self.read()
+        self.updated = {}
+
+    def read(self):
+        """Returns entries saved in the cache file (if any)"""
+
+        try:
+            return json.loads(self.cache_file.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def identity(self,file:Path):
+        """Returns what identifies the current version of `file`"""
+
+        stat = file.stat()
+        return {"size":stat.st_size,"mtime_ns":stat.st_mtime_ns,"hash":fastHash(file)}
+
+    def lookup(self,file:Path,file_type):
+        """Returns the cached entry for `file` if it's unchanged since it was validated as `file_type`, else None"""
+
+        entry = self.entries.get(file.name)
+        if not entry or entry["file_type"] != file_type: return None
+        stat = file.stat()
+        if entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns: return None
+        if entry["hash"] != fastHash(file): return None
+        return entry
+
+    def record(self,file:Path,file_type,valid,records=None,**details):
+        """Caches the validation result for `file` (with any other `details`, like the selection it was downloaded for) and saves the cache"""
+
+        entry = self.identity(file)
+        entry.update({"file_type":file_type,"valid":valid,"records":records,**details})
+        self.entries[file.name] = self.updated[file.name] = entry
+        self.save()
+
+    def save(self):
+        """Atomically writes out the cache, merged with any entries saved by other runs in the meantime"""
+
+        entries = self.read()
+        entries.update(self.updated)
+        directory = self.cache_file.parent
+        entries = {name:entry for name,entry in entries.items() if directory.joinpath(name).exists()}
+        temp_file = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        temp_file.write_text(json.dumps(entries,indent=1))
+        os.replace(temp_file,self.cache_file)
+        self.entries = entries
@@ -8,6 +8,7 @@
 
 import io
 import os
+import re
 import sys
 from shutil import rmtree
 from setuptools import find_packages, setup, Command
@@ -34,12 +35,12 @@ VERSION = config.getclean("tool.poetry","version")
 LICENSE = config.getclean("tool.poetry","license")
 
 # What packages are required for this module to be executed?
-REQUIRED = [f"{k}{clean(v)}" for k,v in config["tool.poetry.dependencies"].items() if "python" not in k]
+dependencies = config["tool.poetry.dependencies"]
+REQUIRED = [f"{k}{clean(v)}" for k,v in dependencies.items() if "python" not in k and "optional" not in v]
 
-# What packages are optional?
-EXTRAS = {
-    # 'fancy feature': ['django'],
-}
+# What packages are optional? (declared like `numpy = {version = ">=1.17", optional = true}` and grouped in tool.poetry.extras)
+OPTIONAL = {k:clean(re.search(r"version\s*=\s*([^,}]+)",v).group(1)) for k,v in dependencies.items() if "optional" in v}
+EXTRAS = {extra:[f"{k}{OPTIONAL[k]}" for k in config.getlist("tool.poetry.extras",extra)] for extra in config["tool.poetry.extras"]}
 
 # The rest you shouldn't have to touch too much :)
 # ------------------------------------------------